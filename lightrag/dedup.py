@@ -0,0 +1,161 @@
+"""
+dedup.py
+────────
+Near-duplicate chunk elimination before entity extraction.
+
+Public-domain book files repeat headers, licence boilerplate and whole
+passages; with overlapping chunks every copy would otherwise pay for an
+extraction call (plus gleaning). ChunkDeduplicator wraps LightRAG's default
+token-size chunker, MinHash-fingerprints each chunk, and uses LSH banding to
+drop chunks whose estimated Jaccard similarity to an already-kept chunk is at
+or above the threshold.
+
+Provenance is kept on the surviving chunk (``duplicate_chunk_order_indices``,
+alongside the ``full_doc_id`` / ``file_path`` LightRAG already stores on it)
+so retrieval of that chunk still points at every original location, and the
+full mapping can be written next to the index with ``save()``.
+
+The saved mapping relies on LightRAG's id scheme (``compute_mdhash_id``, used
+by lightrag-hku up to at least 1.5.x): a chunk id is ``"chunk-" + md5(chunk
+content)`` and a document id is ``"doc-" + md5(cleaned document content)`` —
+the same content the chunker receives. Each location also records its
+document id and file path, so it can be traced even if a release changes the
+key scheme.
+
+Usage:
+    dedup = ChunkDeduplicator(threshold=0.85, file_path=BOOK)
+    rag = LightRAG(..., chunking_func=dedup)
+"""
+
+import json, re, hashlib
+import numpy as np
+from pathlib import Path
+try:
+    from lightrag.chunker import chunking_by_token_size      # lightrag-hku >= 1.5
+except ImportError:
+    from lightrag.operate import chunking_by_token_size      # older releases
+from lightrag.utils import compute_mdhash_id
+
+PRIME        = np.uint64(4294967291)   # largest prime below 2**32 — keeps a*h+b inside uint64
+NUM_PERM     = 128
+BANDS        = 32                      # 32 bands x 4 rows => candidates from ~0.42 Jaccard up
+SHINGLE_SIZE = 5                       # words per shingle
+
+
+class ChunkDeduplicator:
+    def __init__(self, threshold: float = 0.85, num_perm: int = NUM_PERM,
+                 bands: int = BANDS, shingle_size: int = SHINGLE_SIZE, seed: int = 1,
+                 file_path: str = "unknown_source"):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold    = threshold
+        self.bands        = bands
+        self.rows         = num_perm // bands
+        self.shingle_size = shingle_size
+        self.file_path    = file_path       # recorded with every location; set before each insert
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(PRIME), size=num_perm, dtype=np.uint64)
+        self.total_chunks = 0
+        self.skipped      = 0
+        self.provenance   = {}             # kept chunk id -> its location + duplicate locations
+
+    def __call__(self, *args, **kwargs) -> list[dict]:
+        """Drop-in replacement for LightRAG's ``chunking_func``."""
+        # newer releases pass the tokenizer first, older ones start with the content
+        content = kwargs.get("content", next((a for a in args if isinstance(a, str)), ""))
+        doc_id  = compute_mdhash_id(content, prefix="doc-")
+        return self.filter(chunking_by_token_size(*args, **kwargs), doc_id)
+
+    def _shingles(self, text: str) -> set[str]:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + self.shingle_size])
+                for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """MinHash signature of ``text``, or None when it has no words to compare."""
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+        h = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+             for s in shingles),
+            dtype=np.uint64, count=len(shingles),
+        ) % PRIME
+        return ((self._a[:, None] * h[None, :] + self._b[:, None]) % PRIME).min(axis=1)
+
+    def filter(self, chunks: list[dict], doc_id: str) -> list[dict]:
+        """Keep the first chunk of each near-duplicate group, recording where the others were.
+
+        The LSH index is scoped to one call (one document): a kept chunk from an
+        earlier document is already stored and cannot carry new provenance.
+        """
+        kept, kept_sigs, buckets = [], [], {}
+        for chunk in chunks:
+            self.total_chunks += 1
+            sig = self.signature(chunk["content"])
+            if sig is None:
+                kept.append(chunk)
+                kept_sigs.append(None)
+                continue
+
+            keys = [(i, sig[i * self.rows:(i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+            candidates = {k for key in keys for k in buckets.get(key, ())}
+            best, best_sim = None, 0.0
+            for k in candidates:
+                sim = float(np.mean(kept_sigs[k] == sig))
+                if sim > best_sim:
+                    best, best_sim = k, sim
+
+            if best is not None and best_sim >= self.threshold:
+                rep = kept[best]
+                rep.setdefault("duplicate_chunk_order_indices", []).append(chunk["chunk_order_index"])
+                self.skipped += 1
+                continue
+
+            for key in keys:
+                buckets.setdefault(key, []).append(len(kept))
+            kept.append(chunk)
+            kept_sigs.append(sig)
+
+        def _location(order_index):
+            return {"full_doc_id": doc_id, "file_path": self.file_path, "chunk_order_index": order_index}
+
+        for chunk in kept:
+            if "duplicate_chunk_order_indices" in chunk:
+                chunk_id = compute_mdhash_id(chunk["content"], prefix="chunk-")
+                self.provenance[chunk_id] = {
+                    **_location(chunk["chunk_order_index"]),
+                    "duplicates": [_location(i) for i in chunk["duplicate_chunk_order_indices"]],
+                }
+        return kept
+
+    def calls_saved(self, max_gleaning: int) -> int:
+        """Extraction LLM calls avoided: one initial pass plus ``max_gleaning`` per skipped chunk."""
+        return self.skipped * (1 + max_gleaning)
+
+    def save(self, path: Path):
+        """Merge this run's provenance into ``path``.
+
+        Does nothing when no chunks were seen — LightRAG skips documents that are
+        already indexed, and an empty run must not wipe the existing record.
+        """
+        if not self.total_chunks:
+            return
+        path = Path(path)
+        data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else \
+               {"total_chunks": 0, "skipped": 0, "provenance": {}}
+        data["threshold"]     = self.threshold
+        data["total_chunks"] += self.total_chunks
+        data["skipped"]      += self.skipped
+        data["provenance"].update(self.provenance)
+        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+    def report(self, max_gleaning: int):
+        if not self.total_chunks:
+            print("Dedup: no new chunks (document already indexed) — provenance file left unchanged")
+            return
+        print(f"Dedup: skipped {self.skipped}/{self.total_chunks} near-duplicate chunks "
+              f"(threshold {self.threshold}) — saved ~{self.calls_saved(max_gleaning)} LLM calls")
@@ -1,11 +1,21 @@
-import os, asyncio, numpy as np, time, requests
+import os, sys, asyncio, argparse, numpy as np, time, requests
 from lightrag import LightRAG, QueryParam
 from lightrag.utils import EmbeddingFunc
 from openai import AzureOpenAI
 from dotenv import load_dotenv
+from pathlib import Path
+from dedup import ChunkDeduplicator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from profiling import Profiler
 
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Index the full book into ./rag.")
+parser.add_argument("--profile", action="store_true", help="write per-phase pstats, loop lag and collapsed stacks to ../profiles/")
+args = parser.parse_args()
+profiler = Profiler("index", enabled=args.profile)
+
 KEY = os.getenv("AZURE_OPENAI_API_KEY")
 ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 LLM = os.getenv("AZURE_OPENAI_DEPLOYMENT")
@@ -24,6 +34,11 @@ llm_sem = asyncio.Semaphore(4)
 llm_last_call = [0.0]
 LLM_MIN_INTERVAL = 0.06
 
+# Chunks at or above this estimated Jaccard similarity to an earlier chunk skip extraction
+DEDUP_THRESHOLD = 0.85
+BOOK = "../shared-data/Journey to the West.txt"
+dedup = ChunkDeduplicator(threshold=DEDUP_THRESHOLD, file_path=BOOK)
+
 async def llm(prompt, **kwargs):
     headers = {"api-key": KEY, "Content-Type": "application/json"}
     msg = [{"role": "user", "content": prompt}]
@@ -65,6 +80,7 @@ async def init():
     rag = LightRAG(
         working_dir="./rag",
         llm_model_func=llm,
+        chunking_func=dedup,
         embedding_func=EmbeddingFunc(embedding_dim=3072, max_token_size=8192, func=embed),
         embedding_func_max_async=2,   # match semaphore above
         default_embedding_timeout=120, # worker timeout = 120*2 = 240s, survives long Retry-After waits
@@ -72,9 +88,17 @@ async def init():
     await rag.initialize_storages()
     return rag
 
+async def main():
+    with profiler.phase("init"):
+        rag = await init()
+    text = open(BOOK, encoding="utf-8").read()
+    print(f"Indexing {len(text):,} characters (FULL - faster with 600 RPM)...")
+    with profiler.phase("insert"):
+        await rag.ainsert(text, file_paths=[BOOK])
+    dedup.save(Path(rag.working_dir) / "dedup_provenance.json")
+    dedup.report(rag.entity_extract_max_gleaning)
+    print("Done!")
+
 # Index the text - FULL BOOK (with 600 RPM should take ~10-15 min)
-rag = asyncio.run(init())
-text = open("../shared-data/Journey to the West.txt", encoding="utf-8").read()
-print(f"Indexing {len(text):,} characters (FULL - faster with 600 RPM)...")
-rag.insert(text)
-print("Done!")
+with profiler:
+    asyncio.run(main())
@@ -5,14 +5,15 @@ Orchestrates both runners and prints a combined comparison table.
 Results saved to src/results/compare_results.json.
 
 Run from the project root:
-    python src/compare.py
+    python src/compare.py [--profile]
 """
 
-import asyncio, json
+import asyncio, argparse, json
 from datetime import datetime
 from pathlib import Path
 
 from questions import QUESTIONS
+from profiling import Profiler
 from run_lightrag import run_lightrag, LIGHTRAG_MODES
 from run_graphrag import run_graphrag, GRAPHRAG_METHODS
 
@@ -47,13 +48,14 @@ def _print_summary(lr: dict, gr: dict):
             print(row)
 
 
-async def main():
+async def main(profiler: Profiler):
     print("=" * 60)
     print("  GraphRAG vs LightRAG — retrieval comparison")
     print("=" * 60)
 
-    lr_results = await run_lightrag(QUESTIONS)
-    gr_results = run_graphrag(QUESTIONS)
+    lr_results = await run_lightrag(QUESTIONS, profiler)
+    with profiler.phase("graphrag"):
+        gr_results = run_graphrag(QUESTIONS)
 
     out = {"lightrag": lr_results, "graphrag": gr_results}
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -65,4 +67,8 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Run both pipelines and print a comparison table.")
+    parser.add_argument("--profile", action="store_true", help="write per-phase pstats, loop lag and collapsed stacks to profiles/")
+    args = parser.parse_args()
+    with Profiler("compare", enabled=args.profile) as profiler:
+        asyncio.run(main(profiler))
@@ -0,0 +1,240 @@
+"""
+profiling.py
+────────────
+Opt-in profiling for the indexing and query scripts (enabled with --profile).
+
+Per phase it collects:
+  • a cProfile of the main thread          → <phase>.pstats
+  • wall / CPU time and tracemalloc peak    → summary.json
+  • event-loop lag (a watcher task that measures how late its sleeps wake up),
+    and stalls — lags of at least block_threshold, i.e. a callback blocked the loop
+The watcher is started once per event loop, by the first phase entered on it,
+and lives until the loop shuts down; phases only change which name its
+measurements are credited to.
+Across the whole run a sampler thread snapshots the main thread's stack:
+  • every sample                            → stacks.collapsed
+  • samples taken while the loop is blocked → blocked.collapsed
+The .collapsed files use the "frame;frame;frame count" format that
+flamegraph.pl, speedscope and inferno read directly.
+
+asyncio debug mode is deliberately left off: it records a traceback for every
+Handle and Task, which would dominate the timings being measured.
+
+Usage:
+    profiler = Profiler("index", enabled=args.profile)
+    with profiler:
+        with profiler.phase("insert"):
+            ...
+"""
+
+import asyncio, cProfile, json, math, re, sys, threading, time, tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROFILES_DIR = Path(__file__).resolve().parent.parent / "profiles"
+
+
+class Profiler:
+    def __init__(self, name: str, enabled: bool = False, out_dir: Path | None = None,
+                 sample_interval: float = 0.005, lag_interval: float = 0.05,
+                 block_threshold: float = 0.1):
+        self.name            = name
+        self.enabled         = enabled
+        self.out_dir         = Path(out_dir) if out_dir else \
+                               PROFILES_DIR / f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.sample_interval = sample_interval
+        self.lag_interval    = lag_interval
+        self.block_threshold = block_threshold
+
+        self._phases   = {}                 # name -> stats dict (insertion order = first entry)
+        self._profiles = {}                 # name -> cProfile.Profile
+        self._stack    = []
+        self._stacks   = Counter()          # collapsed stack -> samples
+        self._blocked  = Counter()
+        self._peak     = 0
+        self._last_tick  = None             # set by the loop watcher while it runs
+        self._tick_phase = "(no phase)"     # phase a lag measured at the next tick is credited to
+        self._watch_task = None
+        self._summary    = {}
+        self._target     = None
+        self._stop_event = threading.Event()
+        self._sampler    = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self):
+        if not self.enabled:
+            return
+        tracemalloc.start()
+        self._target  = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+        print(f"[profile] writing to {self.out_dir}")
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self._stop_event.set()
+        self._sampler.join()
+        self._fold_peak()
+        tracemalloc.stop()
+        self._write()
+        self._print_summary()
+
+    # ── phases ───────────────────────────────────────────────────────────────
+
+    def _current(self) -> dict:
+        top = self._stack[-1:]              # slice: safe when read from the sampler thread
+        return self._stats(top[0] if top else "(no phase)")
+
+    def _stats(self, name: str) -> dict:
+        return self._phases.setdefault(name, {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mem_bytes": 0,
+            "loop_lag_s": [], "stalls_s": [], "blocked_samples": 0,
+        })
+
+    def _fold_peak(self):
+        """Credit the tracemalloc peak since the last reset to every open phase, then reset."""
+        peak = tracemalloc.get_traced_memory()[1]
+        self._peak = max(self._peak, peak)
+        for name in self._stack:
+            self._phases[name]["peak_mem_bytes"] = max(self._phases[name]["peak_mem_bytes"], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Attribute everything inside the block to ``name``. Re-entering a phase accumulates."""
+        if not self.enabled:
+            yield
+            return
+
+        stats = self._stats(name)
+        prof  = self._profiles.setdefault(name, cProfile.Profile())
+        self._fold_peak()
+        if self._stack:
+            self._profiles[self._stack[-1]].disable()
+        self._stack.append(name)
+
+        self._tick_phase = name             # blocking from here on belongs to this phase
+        self._ensure_watcher()
+
+        t0, c0 = time.perf_counter(), time.process_time()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            stats["calls"]  += 1
+            stats["wall_s"] += time.perf_counter() - t0
+            stats["cpu_s"]  += time.process_time() - c0
+            self._fold_peak()
+            self._stack.pop()
+            if self._stack:
+                self._profiles[self._stack[-1]].enable()
+
+    # ── samplers ─────────────────────────────────────────────────────────────
+
+    def _ensure_watcher(self):
+        """Start the lag watcher on the running loop unless it is already running there."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._watch_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        # Count from now: the task first runs only when the current step yields,
+        # so blocking before the phase's first await is measured as lag too.
+        self._last_tick  = time.perf_counter()
+        self._watch_task = loop.create_task(self._watch_loop(self._last_tick))
+
+    async def _watch_loop(self, due: float):
+        try:
+            while True:
+                now   = time.perf_counter()
+                lag   = max(0.0, now - due)
+                stats = self._stats(self._tick_phase)
+                stats["loop_lag_s"].append(lag)
+                if lag >= self.block_threshold:
+                    stats["stalls_s"].append(round(lag, 4))
+                top = self._stack[-1:]
+                self._last_tick  = now
+                self._tick_phase = top[0] if top else "(no phase)"
+                due = now + self.lag_interval
+                await asyncio.sleep(self.lag_interval)
+        finally:
+            self._last_tick = None          # loop shutting down: stop counting blocked samples
+
+    def _sample(self):
+        while not self._stop_event.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            top   = self._stack[-1:]
+            phase = top[0] if top else "(no phase)"
+            stack = ";".join([phase] + frames[::-1])
+            self._stacks[stack] += 1
+
+            last_tick = self._last_tick
+            if last_tick is not None and \
+                    time.perf_counter() - last_tick > self.lag_interval + self.block_threshold:
+                self._blocked[stack] += 1
+                self._current()["blocked_samples"] += 1
+
+    # ── output ───────────────────────────────────────────────────────────────
+
+    def _write(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        for name, prof in self._profiles.items():
+            safe = re.sub(r"[^\w.-]", "_", name)
+            prof.dump_stats(self.out_dir / f"{safe}.pstats")
+        for fname, counter in [("stacks.collapsed", self._stacks), ("blocked.collapsed", self._blocked)]:
+            (self.out_dir / fname).write_text(
+                "".join(f"{stack} {n}\n" for stack, n in counter.most_common()), encoding="utf-8")
+
+        summary = {"name": self.name, "peak_mem_bytes": self._peak, "phases": {}}
+        for name, s in self._phases.items():
+            lags = sorted(s["loop_lag_s"])
+            summary["phases"][name] = {
+                "calls": s["calls"],
+                "wall_s": round(s["wall_s"], 3),
+                "cpu_s": round(s["cpu_s"], 3),
+                "peak_mem_bytes": s["peak_mem_bytes"],
+                "loop_lag_samples": len(lags),
+                "loop_lag_mean_s": round(sum(lags) / len(lags), 4) if lags else None,
+                "loop_lag_p95_s": round(lags[math.ceil(0.95 * len(lags)) - 1], 4) if lags else None,
+                "loop_lag_max_s": round(lags[-1], 4) if lags else None,
+                "blocked_samples": s["blocked_samples"],
+                "stalls": len(s["stalls_s"]),
+                "stall_total_s": round(sum(s["stalls_s"]), 3),
+                "stall_examples_s": sorted(s["stalls_s"], reverse=True)[:20],
+            }
+        (self.out_dir / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        self._summary = summary
+
+    def _print_summary(self):
+        cols = f"{'Phase':<24}  {'wall s':>9}  {'cpu s':>9}  {'peak MB':>8}  {'lag p95':>8}  {'lag max':>8}  {'stalls':>7}  {'blocked':>7}"
+        print(f"\n[profile] {self.name} — peak memory {self._peak / 2**20:,.1f} MB")
+        print(cols)
+        print("─" * len(cols))
+        for name, s in self._summary["phases"].items():
+            p95 = f"{s['loop_lag_p95_s']:.3f}" if s["loop_lag_p95_s"] is not None else "—"
+            mx  = f"{s['loop_lag_max_s']:.3f}" if s["loop_lag_max_s"] is not None else "—"
+            print(f"{name[:24]:<24}  {s['wall_s']:>9,.2f}  {s['cpu_s']:>9,.2f}  "
+                  f"{s['peak_mem_bytes'] / 2**20:>8,.1f}  {p95:>8}  {mx:>8}  "
+                  f"{s['stalls']:>7}  {s['blocked_samples']:>7}")
+        print(f"[profile] pstats + collapsed stacks → {self.out_dir}")
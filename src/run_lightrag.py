@@ -5,10 +5,10 @@ Runs all QUESTIONS through LightRAG (naive, local, global, hybrid).
 Results saved to src/results/lightrag_results.json.
 
 Run from the project root:
-    python src/run_lightrag.py
+    python src/run_lightrag.py [--profile]
 """
 
-import os, asyncio, json, time
+import os, asyncio, argparse, json, time
 import numpy as np, requests
 from pathlib import Path
 from dotenv import load_dotenv
@@ -25,6 +25,7 @@ EMBED_URL = "https://mchen-mlpmwyb8-eastus2.cognitiveservices.azure.com/openai/d
 LLM_URL   = "https://mchen-mlpmwyb8-eastus2.cognitiveservices.azure.com/openai/deployments/gpt-4o-mini-Light-Rag/chat/completions?api-version=2025-01-01-preview"
 
 from questions import QUESTIONS
+from profiling import Profiler
 from lightrag import LightRAG, QueryParam
 from lightrag.utils import EmbeddingFunc
 
@@ -89,9 +90,11 @@ async def _init_lightrag() -> LightRAG:
     return rag
 
 
-async def run_lightrag(questions: list[str]) -> dict:
+async def run_lightrag(questions: list[str], profiler: Profiler | None = None) -> dict:
+    profiler = profiler or Profiler("run_lightrag")
     print("\n[LightRAG] Initialising …")
-    rag = await _init_lightrag()
+    with profiler.phase("lightrag/init"):
+        rag = await _init_lightrag()
     results = {}
     for q in questions:
         results[q] = {}
@@ -99,7 +102,8 @@ async def run_lightrag(questions: list[str]) -> dict:
             print(f"  [LightRAG/{mode}]  {q[:70]}…")
             t0 = time.time()
             try:
-                answer = await rag.aquery(q, param=QueryParam(mode=mode))
+                with profiler.phase(f"lightrag/{mode}"):
+                    answer = await rag.aquery(q, param=QueryParam(mode=mode))
             except Exception as e:
                 answer = f"ERROR: {e}"
             elapsed = round(time.time() - t0, 2)
@@ -109,7 +113,11 @@ async def run_lightrag(questions: list[str]) -> dict:
 
 
 if __name__ == "__main__":
-    results = asyncio.run(run_lightrag(QUESTIONS))
+    parser = argparse.ArgumentParser(description="Run all QUESTIONS through LightRAG.")
+    parser.add_argument("--profile", action="store_true", help="write per-phase pstats, loop lag and collapsed stacks to profiles/")
+    args = parser.parse_args()
+    with Profiler("run_lightrag", enabled=args.profile) as profiler:
+        results = asyncio.run(run_lightrag(QUESTIONS, profiler))
     out_path = RESULTS_DIR / "lightrag_results.json"
     out_path.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
     print(f"\nResults saved → {out_path}")